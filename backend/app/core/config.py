@@ -1,9 +1,33 @@
-from typing import List
+from functools import lru_cache
+from typing import FrozenSet, List, Literal
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 import json
 
 
+def _parse_list(value: str) -> List[str]:
+    """
+    Parses a list setting given either as JSON or as a comma-separated string.
+
+    The first non-whitespace character decides the format, so the common
+    comma-separated case never goes through a failed JSON parse.
+
+    Args:
+        value (str): The raw setting value.
+
+    Returns:
+        List[str]: The parsed list of strings.
+    """
+    stripped = value.lstrip()
+    if stripped[:1] in ('[', '"'):
+        try:
+            parsed = json.loads(stripped)
+            return parsed if isinstance(parsed, list) else [parsed]
+        except json.JSONDecodeError:
+            pass
+    return [item.strip() for item in value.split(',')]
+
+
 class Settings(BaseSettings):
     """
     Manages application settings using Pydantic's BaseSettings.
@@ -17,11 +41,43 @@ class Settings(BaseSettings):
         app_version (str): The version of the application.
         debug (bool): Flag to enable or disable debug mode.
         gemini_api_key (str): The API key for Google Gemini.
+        gemini_transport (str): The transport used to reach Gemini ("grpc" or "rest");
+            empty for the SDK default. With "rest", asynchronous requests run in a
+            worker thread, since the SDK's REST client is blocking.
+        gemini_warmup (bool): Whether to open the Gemini connections at startup with a
+            one-token request, so the first user request does not pay for the handshake.
+            Off by default, since every process start then sends billable requests.
         cors_origins (List[str]): A list of allowed CORS origins.
         embedding_model (str): The name of the sentence-transformer model for embeddings.
+        embedding_batch_size (int): The number of texts embedded per model forward pass.
+        embedding_max_seq_length (int): The number of tokens of each text that are embedded;
+            longer texts are truncated.
+        compile_embedding_model (bool): Whether to compile the embedding model with
+            `torch.compile`, trading a slower first request for faster inference.
         chunk_size (int): The size of text chunks for document processing.
         chunk_overlap (int): The overlap size between text chunks.
         top_k_results (int): The default number of search results to return.
+        dedup_threshold (float): The cosine similarity above which a search result is
+            dropped as a near-duplicate of a better-ranked one.
+        index_type (str): The vector index to use: "hnsw", or "ivfpq" to switch to a
+            compressed IVF-PQ index once the corpus is large enough to train it.
+        ivfpq_nlist (int): The number of IVF-PQ inverted lists (clusters).
+        ivfpq_m (int): The number of IVF-PQ sub-quantizers; must divide the embedding dimension.
+        ivfpq_nprobe (int): The number of IVF-PQ lists visited per search.
+        hnsw_m (int): The number of neighbors per node in the HNSW search graph.
+        hnsw_ef_construction (int): The HNSW candidate list size used while indexing.
+        hnsw_ef_search (int): The HNSW candidate list size used while searching.
+        mmap_index (bool): Whether to memory-map the vectors of the saved index instead of
+            reading them into memory on startup.
+        semantic_cache_threshold (float): The minimum cosine similarity between two
+            queries for a cached response to be reused.
+        semantic_cache_max_size (int): The maximum number of cached responses.
+        semantic_cache_ttl (int): How long a cached response stays valid, in seconds.
+        max_context_tokens (int): The approximate token budget for context chunks in a prompt.
+        min_similarity (float): The minimum similarity score for a chunk to be used as context.
+            If no chunk reaches it, the model is not called.
+        faq_path (str): Path to an optional JSON file mapping questions to canned answers,
+            which are returned without searching or calling the model.
         max_file_size (int): The maximum allowed file size for uploads in bytes.
         allowed_extensions (List[str]): A list of allowed file extensions for uploads.
         host (str): The host address for the server to bind to.
@@ -34,15 +90,39 @@ class Settings(BaseSettings):
     
     # Google Gemini
     gemini_api_key: str = Field(default="")
+    gemini_transport: Literal["", "grpc", "rest"] = Field(default="")
+    gemini_warmup: bool = Field(default=False)
     
     # CORS
     cors_origins: List[str] = Field(default=["http://localhost:3000", "http://localhost:5173", "https://muditisop.github.io"])
     
     # Vector Store
     embedding_model: str = Field(default="all-MiniLM-L6-v2")
+    embedding_batch_size: int = Field(default=64)
+    embedding_max_seq_length: int = Field(default=256)
+    compile_embedding_model: bool = Field(default=False)
     chunk_size: int = Field(default=500)
     chunk_overlap: int = Field(default=100)
     top_k_results: int = Field(default=5)
+    dedup_threshold: float = Field(default=0.95)
+    index_type: Literal["hnsw", "ivfpq"] = Field(default="hnsw")
+    ivfpq_nlist: int = Field(default=1024)
+    ivfpq_m: int = Field(default=48)
+    ivfpq_nprobe: int = Field(default=16)
+    hnsw_m: int = Field(default=32)
+    hnsw_ef_construction: int = Field(default=200)
+    hnsw_ef_search: int = Field(default=64)
+    mmap_index: bool = Field(default=False)
+    
+    # Semantic Response Cache
+    semantic_cache_threshold: float = Field(default=0.95)
+    semantic_cache_max_size: int = Field(default=1000)
+    semantic_cache_ttl: int = Field(default=3600)
+    
+    # Generation
+    max_context_tokens: int = Field(default=3000)
+    min_similarity: float = Field(default=0.3)
+    faq_path: str = Field(default="")
     
     # File Upload
     max_file_size: int = Field(default=52428800)  # 50MB
@@ -52,6 +132,9 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0")
     port: int = Field(default=8000)
     
+    # Lowercased allowed extensions, built once for O(1) membership checks
+    _allowed_extensions_set: FrozenSet[str] = PrivateAttr(default=frozenset())
+    
     class Config:
         """Pydantic model configuration."""
         env_file = ".env"
@@ -63,22 +146,44 @@ class Settings(BaseSettings):
         This method is automatically called by Pydantic after the model is
         initialized. It checks if `cors_origins` or `allowed_extensions` have been
         provided as a comma-separated string (common for environment variables)
-        and parses them into a proper list of strings. It also supports JSON-formatted
-        strings for `cors_origins`.
+        and parses them into a proper list of strings. JSON-formatted strings
+        are supported for both fields. It also precomputes the set of allowed
+        extensions used to validate uploads.
 
         Args:
             __context: The Pydantic context, not used here.
         """
         # Parse CORS origins if they're a string
         if isinstance(self.cors_origins, str):
-            try:
-                self.cors_origins = json.loads(self.cors_origins)
-            except:
-                self.cors_origins = [origin.strip() for origin in self.cors_origins.split(',')]
+            self.cors_origins = _parse_list(self.cors_origins)
         
         # Parse allowed extensions if they're a string
         if isinstance(self.allowed_extensions, str):
-            self.allowed_extensions = [ext.strip() for ext in self.allowed_extensions.split(',')]
+            self.allowed_extensions = _parse_list(self.allowed_extensions)
+        
+        self._allowed_extensions_set = frozenset(ext.lower() for ext in self.allowed_extensions)
+    
+    @property
+    def allowed_extensions_set(self) -> FrozenSet[str]:
+        """
+        The allowed file extensions as a lowercased frozenset.
+
+        Returns:
+            FrozenSet[str]: The set of allowed extensions.
+        """
+        return self._allowed_extensions_set
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Returns the application settings, constructing them on first use.
+
+    The settings are parsed from the environment only once and the same
+    instance is shared by every caller afterwards. This also allows the
+    function to be used as a FastAPI dependency via `Depends(get_settings)`.
+
+    Returns:
+        Settings: The cached application settings.
+    """
+    return Settings()
\ No newline at end of file
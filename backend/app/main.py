@@ -1,13 +1,17 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+import asyncio
 import uuid
 import os
-from typing import List
+from typing import BinaryIO, Iterator, List
 
-from app.core.config import settings
+import orjson
+
+from app.core.config import get_settings
 from app.models.schemas import (
     FileUploadResponse, 
     QueryRequest, 
@@ -17,14 +21,17 @@ from app.models.schemas import (
     ErrorResponse
 )
 from app.services.document_processor import DocumentProcessor
-from app.services.vector_store import vector_store
-from app.services.generation import generation_service
+from app.services.vector_store import VectorStore, get_vector_store
+from app.services.generation import GenerationError, GenerationService, get_generation_service
+
+settings = get_settings()
 
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="Sera Docs - Your knowledge companion API"
+    description="Sera Docs - Your knowledge companion API",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -48,6 +55,94 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # Initialize services
 document_processor = DocumentProcessor()
 
+# Size of the buffer used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _stream_copy(src: BinaryIO, dest_path: Path, max_size: int) -> int:
+    """
+    Streams an uploaded file to disk, enforcing the maximum file size.
+
+    The upload is copied in fixed-size blocks so that at most one block is
+    held in memory at a time. The partially written file is removed as soon
+    as the size limit is exceeded.
+
+    Args:
+        src (BinaryIO): The file-like object of the upload.
+        dest_path (Path): The path to write the file to.
+        max_size (int): The maximum allowed file size in bytes.
+
+    Returns:
+        int: The number of bytes written.
+
+    Raises:
+        HTTPException: 400 if the file exceeds the maximum size.
+    """
+    total = 0
+    with open(dest_path, "wb") as dest:
+        while True:
+            buf = src.read(UPLOAD_CHUNK_SIZE)
+            if not buf:
+                break
+            total += len(buf)
+            if total > max_size:
+                break
+            dest.write(buf)
+    
+    if total > max_size:
+        dest_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=400,
+            detail=f"File size exceeds maximum of {max_size / 1024 / 1024:.1f}MB"
+        )
+    
+    return total
+
+
+def _clear_uploads():
+    """Deletes every file in the upload directory."""
+    for file_path in UPLOAD_DIR.glob("*"):
+        if file_path.is_file():
+            file_path.unlink()
+
+
+@app.on_event("startup")
+async def load_services():
+    """
+    Constructs the vector store and generation service at startup.
+
+    Loading the embedding model and the saved index is slow, so it is done
+    off the event loop before the first request instead of at import time.
+    The Gemini connections are then warmed up in the background.
+    """
+    await run_in_threadpool(get_vector_store)
+    generation_service = await run_in_threadpool(get_generation_service)
+    
+    if settings.gemini_warmup:
+        # Keep a reference so the task is not garbage collected
+        app.state.warmup_task = asyncio.create_task(generation_service.warm_up())
+
+
+@app.on_event("startup")
+async def build_static_index():
+    """
+    Indexes the built frontend files once at startup.
+
+    The catch-all frontend route looks files up in this index instead of
+    probing the filesystem on every request.
+    """
+    if static_dir.exists():
+        app.state.static_index = frozenset(
+            path.relative_to(static_dir).as_posix()
+            for path in static_dir.rglob("*")
+            if path.is_file()
+        )
+    else:
+        app.state.static_index = frozenset()
+    
+    index_path = static_dir / "index.html"
+    app.state.index_path = index_path if "index.html" in app.state.static_index else None
+
 
 @app.get("/")
 async def root():
@@ -67,7 +162,11 @@ async def root():
 
 
 @app.post("/api/upload", response_model=FileUploadResponse)
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    vector_store: VectorStore = Depends(get_vector_store),
+    generation_service: GenerationService = Depends(get_generation_service)
+):
     """
     Uploads, processes, and ingests a document into the vector store.
 
@@ -77,6 +176,9 @@ async def upload_file(file: UploadFile = File(...)):
 
     Args:
         file (UploadFile): The document to be uploaded.
+        vector_store (VectorStore): The vector store to ingest into.
+        generation_service (GenerationService): The generation service, whose
+                                                response cache is invalidated.
 
     Returns:
         FileUploadResponse: A response confirming the successful ingestion,
@@ -95,43 +197,37 @@ async def upload_file(file: UploadFile = File(...)):
             detail="No filename provided"
         )
     
-    filename_parts = file.filename.split(".")
-    if len(filename_parts) < 2:
+    _, dot_extension = os.path.splitext(file.filename)
+    file_extension = dot_extension[1:].lower()
+    if not file_extension:
         raise HTTPException(
             status_code=422, 
             detail="File must have an extension"
         )
     
-    file_extension = filename_parts[-1].lower()
-    if file_extension not in settings.allowed_extensions:
+    if file_extension not in settings.allowed_extensions_set:
         raise HTTPException(
             status_code=400,
             detail=f"File type '{file_extension}' not supported. Allowed types: {', '.join(settings.allowed_extensions)}"
         )
     
-    # Validate file size
-    contents = await file.read()
-    if len(contents) == 0:
-        raise HTTPException(
-            status_code=422,
-            detail="File is empty"
-        )
-    
-    if len(contents) > settings.max_file_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds maximum of {settings.max_file_size / 1024 / 1024:.1f}MB"
-        )
-
-    
-    # Save file
+    # Stream file to disk, validating its size as it is written
     file_id = str(uuid.uuid4())
     file_path = UPLOAD_DIR / f"{file_id}.{file_extension}"
     
-    with open(file_path, "wb") as f:
-        f.write(contents)
-    
     try:
+        size = await run_in_threadpool(
+            _stream_copy,
+            file.file,
+            file_path,
+            settings.max_file_size
+        )
+        if size == 0:
+            raise HTTPException(
+                status_code=422,
+                detail="File is empty"
+            )
+        
         # Process document
         chunks = await document_processor.process_document(
             str(file_path),
@@ -140,7 +236,8 @@ async def upload_file(file: UploadFile = File(...)):
         )
         
         # Add to vector store
-        num_chunks = vector_store.add_documents(chunks)
+        num_chunks = await run_in_threadpool(vector_store.add_documents, chunks)
+        generation_service.clear_cache()
         
         return FileUploadResponse(
             filename=file.filename,
@@ -149,32 +246,49 @@ async def upload_file(file: UploadFile = File(...)):
             chunks_created=num_chunks
         )
         
-    except Exception as e:
+    except HTTPException:
         # Clean up file on error
-        if file_path.exists():
-            file_path.unlink()
+        await run_in_threadpool(file_path.unlink, missing_ok=True)
+        raise
+        
+    except Exception as e:
+        # Clean up file on error, including a partially written one
+        await run_in_threadpool(file_path.unlink, missing_ok=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+async def query_documents(
+    request: QueryRequest,
+    vector_store: VectorStore = Depends(get_vector_store),
+    generation_service: GenerationService = Depends(get_generation_service)
+):
     """
     Queries the knowledge base and returns a response.
 
     Performs a semantic search on the vector store using the user's query.
     If generation is enabled, it uses the search results as context to
-    generate a natural language answer.
+    generate a natural language answer. Questions found in the FAQ are
+    answered directly, without searching.
 
     Args:
         request (QueryRequest): The user's query and search options.
+        vector_store (VectorStore): The vector store to search.
+        generation_service (GenerationService): The service generating the answer.
 
     Returns:
         QueryResponse: The response containing the answer (if generated)
                        and the source document chunks.
     """
     
-    # Perform semantic search
-    search_results = vector_store.search(
+    # Answer frequently asked questions without searching
+    if request.use_generation:
+        faq_answer = generation_service.answer_faq(request.query)
+        if faq_answer is not None:
+            return QueryResponse(query=request.query, answer=faq_answer, sources=[])
+    
+    # Perform semantic search, batching the query embedding with concurrent requests
+    search_results = await vector_store.search_async(
         query=request.query,
         top_k=request.top_k or settings.top_k_results
     )
@@ -193,7 +307,7 @@ async def query_documents(request: QueryRequest):
     # Generate answer if requested
     answer = None
     if request.use_generation and search_results:
-        answer = generation_service.generate_response(
+        answer = await generation_service.generate_response_async(
             query=request.query,
             context_chunks=search_results,
             max_tokens=2048  # Doubled from default 1024
@@ -206,11 +320,99 @@ async def query_documents(request: QueryRequest):
     )
 
 
+def _sse_event(data: dict) -> bytes:
+    """
+    Encodes a payload as a Server-Sent Events `data` frame.
+
+    Args:
+        data (dict): The JSON-serializable payload.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@app.post("/api/query/stream")
+async def query_documents_stream(
+    request: QueryRequest,
+    vector_store: VectorStore = Depends(get_vector_store),
+    generation_service: GenerationService = Depends(get_generation_service)
+):
+    """
+    Queries the knowledge base and streams the response as Server-Sent Events.
+
+    The first event carries the source document chunks. If generation is
+    enabled, the answer follows as a series of `{"text": ...}` events sent
+    as soon as the model produces them, so the client can start rendering
+    before the full answer is ready. If generation fails midway, an
+    `{"error": ...}` event is sent instead of further text. A final
+    `{"done": true}` event ends the stream. Questions found in the FAQ are
+    answered directly, without searching.
+
+    Args:
+        request (QueryRequest): The user's query and search options.
+        vector_store (VectorStore): The vector store to search.
+        generation_service (GenerationService): The service generating the answer.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response.
+    """
+    
+    # Answer frequently asked questions without searching
+    faq_answer = generation_service.answer_faq(request.query) if request.use_generation else None
+    if faq_answer is not None:
+        frames = [
+            _sse_event({"sources": []}),
+            _sse_event({"text": faq_answer}),
+            _sse_event({"done": True})
+        ]
+        return StreamingResponse(iter(frames), media_type="text/event-stream")
+    
+    # Perform semantic search, batching the query embedding with concurrent requests
+    search_results = await vector_store.search_async(
+        query=request.query,
+        top_k=request.top_k or settings.top_k_results
+    )
+    
+    sources = [
+        DocumentChunk(
+            chunk_id=result["chunk_id"],
+            content=result["content"],
+            metadata=result["metadata"],
+            similarity_score=result.get("similarity_score")
+        ).model_dump()
+        for result in search_results
+    ]
+    
+    def event_stream() -> Iterator[bytes]:
+        yield _sse_event({"sources": sources})
+        
+        if request.use_generation and search_results:
+            try:
+                for text in generation_service.generate_response_stream(
+                    query=request.query,
+                    context_chunks=search_results,
+                    max_tokens=2048
+                ):
+                    yield _sse_event({"text": text})
+            except GenerationError as e:
+                # Sent as its own event so clients can tell it from the answer
+                yield _sse_event({"error": f"Error generating response: {str(e)}"})
+        
+        yield _sse_event({"done": True})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/api/status", response_model=IngestionStatus)
-async def get_status():
+async def get_status(vector_store: VectorStore = Depends(get_vector_store)):
     """
     Retrieves the current status and statistics of the vector store.
 
+    Args:
+        vector_store (VectorStore): The vector store to report on.
+
     Returns:
         IngestionStatus: An object containing the total number of documents
                          and chunks in the store.
@@ -225,21 +427,28 @@ async def get_status():
 
 
 @app.delete("/api/clear")
-async def clear_vector_store():
+async def clear_vector_store(
+    vector_store: VectorStore = Depends(get_vector_store),
+    generation_service: GenerationService = Depends(get_generation_service)
+):
     """
     Clears all data from the vector store and the upload directory.
 
     This is a destructive operation and will remove all ingested knowledge.
 
+    Args:
+        vector_store (VectorStore): The vector store to clear.
+        generation_service (GenerationService): The generation service, whose
+                                                response cache is cleared.
+
     Returns:
         dict: A confirmation message.
     """
-    vector_store.clear()
+    await run_in_threadpool(vector_store.clear)
+    generation_service.clear_cache()
     
     # Also clear uploaded files
-    for file_path in UPLOAD_DIR.glob("*"):
-        if file_path.is_file():
-            file_path.unlink()
+    await run_in_threadpool(_clear_uploads)
     
     return {"message": "Vector store cleared successfully"}
 
@@ -251,19 +460,13 @@ async def serve_frontend(full_path: str):
     Serve the React frontend for any non-API routes.
     This allows React Router to handle client-side routing.
     """
-    static_dir = Path("./static")
-    if static_dir.exists():
-        # Try to serve the file if it exists
-        file_path = static_dir / full_path
-        if file_path.exists() and file_path.is_file():
-            from fastapi.responses import FileResponse
-            return FileResponse(file_path)
-        
-        # For all other routes, serve index.html (React Router)
-        index_path = static_dir / "index.html"
-        if index_path.exists():
-            from fastapi.responses import FileResponse
-            return FileResponse(index_path)
+    # Serve the file if it is part of the built frontend
+    if full_path in app.state.static_index:
+        return FileResponse(static_dir / full_path)
+    
+    # For all other routes, serve index.html (React Router)
+    if app.state.index_path is not None:
+        return FileResponse(app.state.index_path)
     
     # Fallback to API response if no static files
     return {"message": "Frontend not available"}
@@ -282,9 +485,9 @@ async def http_exception_handler(request, exc):
         exc (HTTPException): The raised exception.
 
     Returns:
-        JSONResponse: A JSON response with the error details.
+        ORJSONResponse: A JSON response with the error details.
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail}
     )
@@ -1,16 +1,144 @@
+import asyncio
+import csv
+import multiprocessing
 import os
-from typing import List, Dict, Any
+import threading
+import zipfile
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+try:
+    import blake3
+except ImportError:  # Optional accelerator; fall back to hashlib
+    blake3 = None
+
+import numpy as np
 
 # Document processors
 from pypdf import PdfReader
-from docx import Document as DocxDocument
+from lxml import etree
 from pptx import Presentation
-from bs4 import BeautifulSoup
-import pandas as pd
 
-from app.core.config import settings
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # Fall back to BeautifulSoup's pure-Python parser
+    HTMLParser = None
+    from bs4 import BeautifulSoup
+
+from app.core.config import get_settings
+
+
+# WordprocessingML tags used when extracting text from DOCX files
+DOCX_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_PARAGRAPH_TAG = f"{DOCX_NAMESPACE}p"
+DOCX_RUN_TAG = f"{DOCX_NAMESPACE}r"
+DOCX_RUN_TEXT_TAG = f"{DOCX_NAMESPACE}t"
+DOCX_TEXT_TAGS = {
+    f"{DOCX_NAMESPACE}tab": "\t",
+    f"{DOCX_NAMESPACE}br": "\n",
+    f"{DOCX_NAMESPACE}cr": "\n",
+}
+
+# HTML elements whose contents are code or markup rather than visible text
+HTML_NON_TEXT_TAGS = ["script", "style", "noscript", "template"]
+
+# Minimum number of PDF pages handed to each extraction process
+PDF_MIN_PAGES_PER_WORKER = 4
+
+# Lookup table marking the code points that `str.split()` treats as
+# whitespace; none lies above U+3000, so larger code points are clamped to
+# the final entry, which is False
+_WHITESPACE_TABLE = np.array([chr(c).isspace() for c in range(0x3002)], dtype=bool)
+_WHITESPACE_TABLE[-1] = False
+
+# Process pool shared by all PDF extractions, created on first use
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _extract_pdf_pages(page_range: Tuple[str, int, int]) -> List[str]:
+    """
+    Extracts the text of a range of pages from a PDF file.
+
+    This is a module-level function so that it can be run in a worker process.
+
+    Args:
+        page_range (Tuple[str, int, int]): The PDF path, the first page index
+                                           and the (exclusive) last page index.
+
+    Returns:
+        List[str]: The text of each page in the range.
+    """
+    file_path, start, end = page_range
+    with open(file_path, 'rb') as file:
+        pdf_reader = PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used to extract PDF pages, creating it if needed.
+
+    A single pool sized to the CPU count is shared by all documents, so
+    concurrent uploads queue for the same workers instead of each starting
+    its own. Workers are started with forkserver (or spawn where it is not
+    available) rather than fork, which is unsafe in a process that already
+    runs threads.
+
+    Returns:
+        ProcessPoolExecutor: The shared process pool.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Shuts down a broken PDF process pool so that the next use creates a new one.
+
+    Args:
+        pool (ProcessPoolExecutor): The pool that broke. If another thread
+                                    has already replaced it, the current
+                                    pool is left alone.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=2048)
+def _chunk_id(text: str) -> str:
+    """
+    Computes a 128-bit hex digest of a chunk's text, used as its identifier.
+
+    Uses BLAKE3 (SIMD tree hashing) when available and falls back to
+    SHA-256, which is hardware accelerated on CPUs with SHA extensions.
+    Results are cached so that boilerplate repeated across documents
+    (headers, footers, templates) is only hashed once.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: A 32-character hexadecimal digest.
+    """
+    data = text.encode('utf-8')
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest(length=16)
+    return hashlib.sha256(data).hexdigest()[:32]
 
 
 class DocumentProcessor:
@@ -22,11 +150,39 @@ class DocumentProcessor:
     embedding and vector storage.
     """
     
+    # Maps each supported file type to the name of its extraction method
+    _EXTRACTORS = {
+        'pdf': '_extract_pdf',
+        'docx': '_extract_docx',
+        'pptx': '_extract_pptx',
+        'txt': '_extract_txt',
+        'csv': '_extract_csv',
+        'html': '_extract_html',
+    }
+    
     def __init__(self):
-        """Initializes the DocumentProcessor with chunking settings."""
+        """
+        Initializes the DocumentProcessor with chunking settings.
+
+        Raises:
+            ValueError: If the chunk size is not positive or the overlap is
+                        not smaller than the chunk size.
+        """
+        settings = get_settings()
         self.chunk_size = settings.chunk_size
         self.chunk_overlap = settings.chunk_overlap
         
+        if self.chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {self.chunk_size}")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError(
+                f"chunk_overlap must be between 0 and chunk_size ({self.chunk_size}), "
+                f"got {self.chunk_overlap}"
+            )
+        
+        # Bounds concurrent document processing; see process_document
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
     def extract_text(self, file_path: str, file_type: str) -> str:
         """
         Extracts text from a document based on its file type.
@@ -44,20 +200,11 @@ class DocumentProcessor:
         Raises:
             ValueError: If the file type is not supported.
         """
-        extractors = {
-            'pdf': self._extract_pdf,
-            'docx': self._extract_docx,
-            'pptx': self._extract_pptx,
-            'txt': self._extract_txt,
-            'csv': self._extract_csv,
-            'html': self._extract_html,
-        }
-        
-        extractor = extractors.get(file_type.lower())
-        if not extractor:
+        extractor_name = self._EXTRACTORS.get(file_type.lower())
+        if not extractor_name:
             raise ValueError(f"Unsupported file type: {file_type}")
             
-        return extractor(file_path)
+        return getattr(self, extractor_name)(file_path)
     
     def _extract_pdf(self, file_path: str) -> str:
         """
@@ -69,25 +216,69 @@ class DocumentProcessor:
         Returns:
             str: The concatenated text from all pages.
         """
-        text = ""
         with open(file_path, 'rb') as file:
             pdf_reader = PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+            num_pages = len(pdf_reader.pages)
+            
+            # Small PDFs are not worth the cost of sending to worker processes
+            workers = min(os.cpu_count() or 1, num_pages // PDF_MIN_PAGES_PER_WORKER)
+            if workers <= 1:
+                parts = [page.extract_text() for page in pdf_reader.pages]
+                return "".join(part + "\n" for part in parts)
+        
+        # Split the pages into one contiguous range per worker; each worker
+        # reopens the PDF since pypdf objects cannot be pickled.
+        bounds = [num_pages * i // workers for i in range(workers + 1)]
+        ranges = [(file_path, bounds[i], bounds[i + 1]) for i in range(workers)]
+        for attempt in range(2):
+            pool = _get_pdf_pool()
+            try:
+                page_texts = list(pool.map(_extract_pdf_pages, ranges))
+                break
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for running out of memory), which
+                # leaves the whole pool unusable; retry once on a fresh one
+                print(f"Warning: PDF worker process died while extracting {file_path}")
+                _discard_pdf_pool(pool)
+                if attempt:
+                    raise
+        parts = [text for texts in page_texts for text in texts]
+        return "".join(part + "\n" for part in parts)
     
     def _extract_docx(self, file_path: str) -> str:
         """
         Extracts text from a DOCX file.
 
+        The paragraphs are read directly from the document XML rather than
+        through python-docx's object model.
+
         Args:
             file_path (str): The path to the DOCX file.
 
         Returns:
             str: The concatenated text from all paragraphs.
         """
-        doc = DocxDocument(file_path)
-        return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        paragraphs = []
+        with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml_file:
+            # The XML comes from an uploaded file, so never expand entities
+            # or fetch anything they point to
+            for _, paragraph in etree.iterparse(
+                xml_file,
+                tag=DOCX_PARAGRAPH_TAG,
+                resolve_entities=False,
+                no_network=True,
+                huge_tree=False
+            ):
+                # Only look inside runs: paragraph properties also contain
+                # w:tab elements, which define tab stops rather than text
+                paragraphs.append("".join(
+                    DOCX_TEXT_TAGS.get(element.tag) or element.text or ""
+                    for run in paragraph.iter(DOCX_RUN_TAG)
+                    for element in run.iterchildren(DOCX_RUN_TEXT_TAG, *DOCX_TEXT_TAGS)
+                ))
+                # Drop parsed paragraphs to keep memory flat on large documents
+                paragraph.clear()
+        return "\n".join(paragraphs)
     
     def _extract_pptx(self, file_path: str) -> str:
         """
@@ -100,12 +291,13 @@ class DocumentProcessor:
             str: The concatenated text from all shapes on all slides.
         """
         prs = Presentation(file_path)
-        text = ""
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text
+        parts = [
+            shape.text + "\n"
+            for slide in prs.slides
+            for shape in slide.shapes
+            if hasattr(shape, "text")
+        ]
+        return "".join(parts)
     
     def _extract_txt(self, file_path: str) -> str:
         """
@@ -122,16 +314,19 @@ class DocumentProcessor:
     
     def _extract_csv(self, file_path: str) -> str:
         """
-        Extracts text from a CSV file by converting it to a string.
+        Extracts text from a CSV file, one line of text per row.
+
+        The file is streamed row by row; only the text is needed for
+        embedding, so no tabular rendering is produced.
 
         Args:
             file_path (str): The path to the CSV file.
 
         Returns:
-            str: A string representation of the CSV data.
+            str: The CSV rows with their cells separated by spaces.
         """
-        df = pd.read_csv(file_path)
-        return df.to_string()
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
+            return "\n".join(" ".join(row) for row in csv.reader(file))
     
     def _extract_html(self, file_path: str) -> str:
         """
@@ -143,6 +338,15 @@ class DocumentProcessor:
         Returns:
             str: The visible text content of the HTML.
         """
+        if HTMLParser is not None:
+            tree = HTMLParser(Path(file_path).read_bytes())
+            # Lexbor returns the contents of scripts and styles as text
+            tree.strip_tags(HTML_NON_TEXT_TAGS)
+            # Separate text nodes so that adjacent blocks in minified HTML
+            # do not run together
+            node = tree.body if tree.body is not None else tree.root
+            return node.text(separator="\n") if node is not None else ""
+        
         with open(file_path, 'r', encoding='utf-8') as file:
             soup = BeautifulSoup(file.read(), 'html.parser')
             return soup.get_text()
@@ -163,25 +367,43 @@ class DocumentProcessor:
                                   dictionary contains the chunk ID, content,
                                   and metadata.
         """
-        words = text.split()
+        # Find the (start, end) character offsets of every word with array
+        # operations over the code points, so chunks can be sliced straight
+        # out of the original text instead of re-joined.
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        is_word = ~_WHITESPACE_TABLE[np.minimum(codes, len(_WHITESPACE_TABLE) - 1)]
+        edges = np.flatnonzero(np.diff(is_word, prepend=False, append=False))
+        starts = edges[0::2]
+        ends = edges[1::2]
+        num_words = len(starts)
         chunks = []
         
-        for i in range(0, len(words), self.chunk_size - self.chunk_overlap):
-            chunk_words = words[i:i + self.chunk_size]
-            chunk_text = " ".join(chunk_words)
-            
-            if chunk_text.strip():  # Skip empty chunks
-                chunk_id = hashlib.md5(chunk_text.encode()).hexdigest()
-                chunks.append({
-                    "chunk_id": chunk_id,
-                    "content": chunk_text,
-                    "metadata": {
-                        **metadata,
-                        "chunk_index": len(chunks),
-                        "start_index": i,
-                        "end_index": min(i + self.chunk_size, len(words))
-                    }
-                })
+        if num_words == 0:
+            return chunks
+        
+        # Stop at the first window that reaches the end of the text; any later
+        # window would only repeat words already covered by the overlap.
+        step = self.chunk_size - self.chunk_overlap
+        last_start = max(num_words - self.chunk_size, 0)
+        
+        # Word range of every window, and its character range in the text
+        window_starts = np.arange(0, last_start + step, step)
+        window_ends = np.minimum(window_starts + self.chunk_size, num_words)
+        char_ranges = zip(starts[window_starts].tolist(), ends[window_ends - 1].tolist())
+        
+        for i, end, (char_start, char_end) in zip(window_starts.tolist(), window_ends.tolist(), char_ranges):
+            chunk_text = text[char_start:char_end]
+            chunk_id = _chunk_id(chunk_text)
+            chunks.append({
+                "chunk_id": chunk_id,
+                "content": chunk_text,
+                "metadata": dict(
+                    metadata,
+                    chunk_index=len(chunks),
+                    start_index=i,
+                    end_index=end
+                )
+            })
         
         return chunks
     
@@ -189,6 +411,29 @@ class DocumentProcessor:
         """
         Orchestrates the full processing of a single document.
 
+        The CPU-bound processing runs in a worker thread so that it does not
+        block the event loop. The number of documents processed at once is
+        bounded to avoid oversubscribing the CPU.
+
+        Args:
+            file_path (str): The path to the document file.
+            filename (str): The original name of the file.
+            file_type (str): The file extension.
+
+        Returns:
+            List[Dict[str, Any]]: A list of chunk dictionaries ready for ingestion.
+        """
+        # Created lazily since no event loop is running at import time
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(min(8, os.cpu_count() or 4))
+        
+        async with self._semaphore:
+            return await asyncio.to_thread(self._process_sync, file_path, filename, file_type)
+    
+    def _process_sync(self, file_path: str, filename: str, file_type: str) -> List[Dict[str, Any]]:
+        """
+        Processes a single document synchronously.
+
         This method handles the entire pipeline: extracting text from the file,
         creating metadata, and splitting the text into chunks.
 
@@ -0,0 +1,130 @@
+import asyncio
+import os
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import get_settings
+
+
+# Let the Rust tokenizers use all cores to tokenize a batch
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+# Maximum number of queued texts embedded together, and how long the first
+# text of a batch waits for others to arrive, in seconds
+QUERY_BATCH_SIZE = 32
+QUERY_BATCH_WAIT = 0.005
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> SentenceTransformer:
+    """
+    Returns the sentence-transformer model, loading it on first use.
+
+    The same model is shared by every service that embeds text, so it is
+    only loaded into memory once. It runs on the GPU when one is available,
+    in half precision to halve memory traffic. Inputs are truncated to
+    `embedding_max_seq_length` tokens to keep padding short, and the model
+    is compiled if `compile_embedding_model` is set.
+
+    Returns:
+        SentenceTransformer: The loaded model.
+    """
+    settings = get_settings()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(settings.embedding_model, device=device)
+    if device == "cuda":
+        model.half()
+    model.max_seq_length = settings.embedding_max_seq_length
+    
+    # Slow (pure-Python) tokenizers can dominate embedding time
+    if not getattr(model.tokenizer, "is_fast", False):
+        print(f"Warning: {settings.embedding_model} has no fast tokenizer; embedding will be slower")
+    
+    if settings.compile_embedding_model:
+        # Compiles the transformer module in place, keeping the model's API
+        model[0].compile(dynamic=True)
+    
+    return model
+
+
+class EmbedBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batches.
+
+    Texts submitted within `max_wait` seconds of each other are embedded in
+    a single call, up to `max_batch_size` at a time, so that concurrent
+    requests share one model forward pass instead of each running a batch
+    of one.
+    """
+    
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = QUERY_BATCH_SIZE,
+        max_wait: float = QUERY_BATCH_WAIT
+    ):
+        """
+        Initializes the EmbedBatcher.
+
+        Args:
+            encode (Callable[[List[str]], np.ndarray]): Embeds a list of texts,
+                returning one row per text. It is run in a worker thread.
+            max_batch_size (int): The maximum number of texts per call to `encode`.
+            max_wait (float): How long to wait for more texts before embedding
+                a batch, in seconds.
+        """
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Created lazily, since they belong to the event loop they run on
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embeds a single text as part of the next batch.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            np.ndarray: The embedding of the text.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+    
+    async def _run(self):
+        """Embeds queued texts batch by batch, resolving each caller's future."""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            # Give concurrent requests a moment to join the batch
+            if queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                embeddings = await asyncio.to_thread(self.encode, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                # The caller may have been cancelled while waiting
+                if not future.done():
+                    future.set_result(embedding)
\ No newline at end of file
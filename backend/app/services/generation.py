@@ -1,6 +1,17 @@
+import asyncio
+import json
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional
-from app.core.config import settings
+import numpy as np
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.response_cache import SemanticResponseCache
+from app.services.vector_store import VectorStore, get_vector_store
+
+
+class GenerationError(Exception):
+    """Raised when the Gemini API fails while a response is being streamed."""
 
 
 class GenerationService:
@@ -11,20 +22,77 @@ class GenerationService:
     including prompt engineering to give the AI a specific personality ("Sera").
     """
     
-    def __init__(self):
+    # Invariant parts of the prompt, surrounding the context and the query
+    PROMPT_PREFIX = """You are Sera, a warm, intelligent, and caring AI companion. You have a gentle, feminine personality - 
+think of yourself as a knowledgeable friend who's always happy to help. You're thoughtful, empathetic, and occasionally 
+add subtle touches of warmth to your responses (like using words such as "lovely", "wonderful", "dear" when appropriate).
+
+Use the following context to answer the user's question. Be accurate but also friendly and personable.
+
+Context:
+"""
+    PROMPT_MIDDLE = "\n\nUser Question: "
+    PROMPT_SUFFIX = """
+
+Personality Guidelines:
+- Be warm and friendly, like talking to a caring friend
+- Use gentle, encouraging language ("I'd be happy to help", "That's a great question", "Let me find that for you")
+- When appropriate, use subtle feminine touches ("Oh, that's interesting!", "I noticed something lovely here")
+- Be supportive and empathetic ("I understand", "I can see why you're asking")
+- Add occasional emoticons sparingly and tastefully (♡, ✨) only when it feels natural
+- Stay professional but warm - like a knowledgeable friend rather than a cold assistant
+
+Response Instructions:
+1. Answer with warmth while being informative and accurate
+2. Use only information from the provided context
+3. Cite sources using [N] format, where N is the number of the source in the context
+4. If the context doesn't contain the answer, say something like "Oh, I'm sorry dear, but I couldn't find that information in the documents we have. Perhaps we could look at it from a different angle?"
+5. Be helpful, caring, and make the user feel heard and supported
+
+Your response:"""
+    
+    # Returned without calling the model when no relevant context was found
+    NO_ANSWER_MESSAGE = (
+        "Oh, I'm sorry dear, but I couldn't find that information in the documents we have. "
+        "Perhaps we could look at it from a different angle?"
+    )
+    
+    def __init__(self, vector_store: Optional[VectorStore] = None):
         """
         Initializes the GenerationService.
 
-        Configures the Google Generative AI client with the API key from settings.
+        Configures the Google Generative AI client with the API key and
+        transport from settings.
         If the API key is not provided, the model is not initialized, and a
-        warning is printed.
+        warning is printed. The FAQ table is loaded if one is configured.
+
+        Args:
+            vector_store (Optional[VectorStore]): The vector store whose
+                query embeddings key the semantic response cache. Sharing
+                them means a query searched for is not embedded again. If
+                not provided, responses are not cached.
         """
+        settings = get_settings()
         if settings.gemini_api_key:
-            genai.configure(api_key=settings.gemini_api_key)
+            genai.configure(api_key=settings.gemini_api_key, transport=settings.gemini_transport or None)
             self.model = genai.GenerativeModel('gemini-2.5-flash')
         else:
             self.model = None
             print("Warning: Gemini API key not configured")
+        # The SDK's REST client blocks even in its async methods
+        self.blocking_async = settings.gemini_transport == "rest"
+        
+        self.faq = self._load_faq(settings.faq_path)
+        
+        self.vector_store = vector_store
+        self.cache = None
+        if vector_store is not None:
+            self.cache = SemanticResponseCache(
+                dimension=vector_store.dimension,
+                threshold=settings.semantic_cache_threshold,
+                max_size=settings.semantic_cache_max_size,
+                ttl=settings.semantic_cache_ttl
+            )
     
     def generate_response(
         self,
@@ -35,9 +103,8 @@ class GenerationService:
         """
         Generates an AI response based on a query and context.
 
-        This method constructs a detailed prompt, sends it to the Gemini API,
-        and returns the generated text. It handles cases where the API key
-        is not configured or an error occurs during generation.
+        This is a non-streaming wrapper around `generate_response_stream`
+        that returns the complete response at once.
 
         Args:
             query (str): The user's query.
@@ -48,9 +115,58 @@ class GenerationService:
         Returns:
             str: The AI-generated response, or an error message.
         """
+        try:
+            return "".join(self.generate_response_stream(query, context_chunks, max_tokens))
+        except GenerationError as e:
+            return f"Error generating response: {str(e)}"
+    
+    def generate_response_stream(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 1024
+    ) -> Iterator[str]:
+        """
+        Generates an AI response based on a query and context, piece by piece.
+
+        This method constructs a detailed prompt, sends it to the Gemini API
+        in streaming mode and yields the text of each chunk as soon as it
+        arrives. The API is not called when none of the context chunks is
+        relevant enough, and responses to queries that are semantically
+        near-identical to a recent query are served from the response cache.
+        It handles the case where the API key is not configured by yielding
+        an error message. Errors from the API are raised instead, so they
+        are never mistaken for part of the response.
+
+        Args:
+            query (str): The user's query.
+            context_chunks (List[Dict[str, Any]]): A list of context chunks
+                                                   retrieved from the vector store.
+            max_tokens (int): The maximum number of tokens for the response.
+
+        Yields:
+            str: Successive pieces of the AI-generated response, or an error message.
+
+        Raises:
+            GenerationError: If the Gemini API fails, possibly after some
+                pieces have already been yielded.
+        """
         
         if not self.model:
-            return "Gemini API key not configured. Please set GEMINI_API_KEY in your environment."
+            yield "Gemini API key not configured. Please set GEMINI_API_KEY in your environment."
+            return
+        
+        # Without relevant context the model could only apologize, so skip it
+        context_chunks = self._select_context(context_chunks)
+        if not context_chunks:
+            yield self.NO_ANSWER_MESSAGE
+            return
+        
+        # Serve semantically repeated queries from the cache
+        query_embedding, cached_response = self._lookup_cache(query)
+        if cached_response is not None:
+            yield cached_response
+            return
         
         # Format context
         context_text = self._format_context(context_chunks)
@@ -62,18 +178,261 @@ class GenerationService:
             # Generate response
             response = self.model.generate_content(
                 prompt,
-                generation_config=genai.GenerationConfig(
-                    max_output_tokens=max_tokens,
-                    temperature=0.7,
-                    top_p=0.9,
-                )
+                stream=True,
+                generation_config=self._generation_config(max_tokens)
             )
             
-            return response.text
+            parts = []
+            for chunk in response:
+                parts.append(chunk.text)
+                yield chunk.text
+            
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            raise GenerationError(str(e)) from e
+        
+        if self.cache is not None:
+            self.cache.put(query_embedding, "".join(parts))
+    
+    async def generate_response_async(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        max_tokens: int = 1024
+    ) -> str:
+        """
+        Generates an AI response based on a query and context, asynchronously.
+
+        The Gemini request is awaited instead of blocking a worker thread,
+        so a single event loop can serve many generations concurrently.
+        The API is not called when none of the context chunks is relevant
+        enough, and responses to queries that are semantically near-identical
+        to a recent query are served from the response cache.
+
+        Args:
+            query (str): The user's query.
+            context_chunks (List[Dict[str, Any]]): A list of context chunks
+                                                   retrieved from the vector store.
+            max_tokens (int): The maximum number of tokens for the response.
+
+        Returns:
+            str: The AI-generated response, or an error message.
+        """
+        
+        if not self.model:
+            return "Gemini API key not configured. Please set GEMINI_API_KEY in your environment."
+        
+        # Without relevant context the model could only apologize, so skip it
+        context_chunks = self._select_context(context_chunks)
+        if not context_chunks:
+            return self.NO_ANSWER_MESSAGE
+        
+        # Serve semantically repeated queries from the cache
+        query_embedding, cached_response = None, None
+        if self.cache is not None:
+            query_embedding = await self.vector_store.embed_query_async(query)
+            cached_response = self.cache.get(query_embedding)
+        if cached_response is not None:
+            return cached_response
+        
+        # Format context
+        context_text = self._format_context(context_chunks)
+        
+        # Create prompt
+        prompt = self._create_prompt(query, context_text)
+        
+        try:
+            # Generate response
+            response = await self._generate_content_async(
+                prompt,
+                self._generation_config(max_tokens)
+            )
+            text = response.text
             
         except Exception as e:
             print(f"Error generating response: {e}")
             return f"Error generating response: {str(e)}"
+        
+        if self.cache is not None:
+            self.cache.put(query_embedding, text)
+        
+        return text
+    
+    async def _generate_content_async(self, prompt: str, generation_config: genai.GenerationConfig):
+        """
+        Sends a generation request to Gemini without blocking the event loop.
+
+        With the REST transport, the SDK's async method makes a blocking
+        HTTP call, so the synchronous method is run in a worker thread
+        instead.
+
+        Args:
+            prompt (str): The prompt to send.
+            generation_config (genai.GenerationConfig): The generation settings.
+
+        Returns:
+            The SDK's generation response.
+        """
+        if self.blocking_async:
+            return await asyncio.to_thread(self.model.generate_content, prompt, generation_config=generation_config)
+        return await self.model.generate_content_async(prompt, generation_config=generation_config)
+    
+    async def warm_up(self):
+        """
+        Opens the connections to the Gemini API ahead of the first request.
+
+        Sends a one-token request through the synchronous client, used for
+        streaming, and through the asynchronous one unless the REST transport
+        routes asynchronous requests through the synchronous client as well,
+        so that the connection setup and TLS handshakes are not paid by the
+        first user. Failures are only logged, since the real requests will
+        retry the connection.
+        """
+        if not self.model:
+            return
+        
+        config = genai.GenerationConfig(max_output_tokens=1)
+        requests = [asyncio.to_thread(self.model.generate_content, "hi", generation_config=config)]
+        if not self.blocking_async:
+            requests.append(self.model.generate_content_async("hi", generation_config=config))
+        try:
+            await asyncio.gather(*requests)
+        except Exception as e:
+            print(f"Error warming up Gemini connection: {e}")
+    
+    def answer_faq(self, query: str) -> Optional[str]:
+        """
+        Looks up a canned answer for a frequently asked question.
+
+        Questions are matched exactly, ignoring case and whitespace.
+
+        Args:
+            query (str): The user's query.
+
+        Returns:
+            Optional[str]: The canned answer, or None if the query is not in the FAQ.
+        """
+        return self.faq.get(self._normalize_question(query))
+    
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """
+        Normalizes a question for FAQ lookups by lowercasing it and collapsing whitespace.
+
+        Args:
+            question (str): The question to normalize.
+
+        Returns:
+            str: The normalized question.
+        """
+        return " ".join(question.lower().split())
+    
+    def _load_faq(self, path: str) -> Dict[str, str]:
+        """
+        Loads the FAQ table from a JSON file mapping questions to answers.
+
+        Args:
+            path (str): The path to the JSON file, or an empty string for no FAQ.
+
+        Returns:
+            Dict[str, str]: The answers, keyed by normalized question.
+        """
+        if not path:
+            return {}
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return {self._normalize_question(question): answer for question, answer in entries.items()}
+        except Exception as e:
+            print(f"Error loading FAQ: {e}")
+            return {}
+    
+    def _lookup_cache(self, query: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        Embeds a query and looks up a cached response for it.
+
+        Args:
+            query (str): The user's query.
+
+        Returns:
+            Tuple[Optional[np.ndarray], Optional[str]]: The query embedding
+                (None if caching is disabled) and the cached response, if any.
+        """
+        if self.cache is None:
+            return None, None
+        
+        query_embedding = self.vector_store.embed_query(query)
+        return query_embedding, self.cache.get(query_embedding)
+    
+    def _generation_config(self, max_tokens: int) -> genai.GenerationConfig:
+        """
+        Builds the generation settings used for every request.
+
+        Args:
+            max_tokens (int): The maximum number of tokens for the response.
+
+        Returns:
+            genai.GenerationConfig: The generation configuration.
+        """
+        return genai.GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=0.7,
+            top_p=0.9,
+        )
+    
+    def clear_cache(self):
+        """
+        Clears the semantic response cache.
+
+        Should be called whenever the document store changes, since cached
+        responses were generated from the previous documents.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+    
+    def _select_context(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Selects the context chunks to include in the prompt.
+
+        Chunks below the minimum similarity are dropped, and the rest are
+        taken in order of decreasing similarity until the token budget is
+        spent. Tokens are estimated as four characters each. The chunk that
+        crosses the budget is cut at the last sentence boundary that fits,
+        or at the budget itself if it has none.
+
+        Args:
+            chunks (List[Dict[str, Any]]): The chunks retrieved from the vector store.
+
+        Returns:
+            List[Dict[str, Any]]: The chunks to use as context.
+        """
+        settings = get_settings()
+        relevant = sorted(
+            (chunk for chunk in chunks
+             if chunk.get('similarity_score', 1.0) >= settings.min_similarity),
+            key=lambda chunk: chunk.get('similarity_score', 1.0),
+            reverse=True
+        )
+        
+        selected = []
+        budget = settings.max_context_tokens * 4
+        for chunk in relevant:
+            content = chunk.get('content', '')
+            if len(content) <= budget:
+                selected.append(chunk)
+                budget -= len(content)
+                continue
+            
+            # Out of budget: keep whole sentences of this chunk, then stop
+            head = content[:budget]
+            if '.' in head:
+                head = head.rsplit('.', 1)[0] + '.'
+            if head.strip():
+                selected.append(dict(chunk, content=head))
+            break
+        
+        return selected
     
     def _format_context(self, chunks: List[Dict[str, Any]]) -> str:
         """
@@ -89,21 +448,17 @@ class GenerationService:
         if not chunks:
             return "No relevant context found."
         
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            metadata = chunk.get("metadata", {})
-            source = metadata.get("filename", "Unknown")
-            content = chunk.get("content", "")
-            
-            context_parts.append(f"[Source {i}: {source}]\n{content}\n")
-        
-        return "\n".join(context_parts)
+        return "\n".join(
+            f"[{i}:{chunk.get('metadata', {}).get('filename', 'Unknown')}]\n{chunk.get('content', '')}\n"
+            for i, chunk in enumerate(chunks, 1)
+        )
     
     def _create_prompt(self, query: str, context: str) -> str:
         """
         Creates the final prompt string to be sent to the Gemini model.
 
         This includes the persona, instructions, context, and the user query.
+        The persona and instructions are precomputed class constants.
 
         Args:
             query (str): The user's question.
@@ -112,34 +467,19 @@ class GenerationService:
         Returns:
             str: The complete prompt for the language model.
         """
-        return f"""You are Sera, a warm, intelligent, and caring AI companion. You have a gentle, feminine personality - 
-think of yourself as a knowledgeable friend who's always happy to help. You're thoughtful, empathetic, and occasionally 
-add subtle touches of warmth to your responses (like using words such as "lovely", "wonderful", "dear" when appropriate).
-
-Use the following context to answer the user's question. Be accurate but also friendly and personable.
-
-Context:
-{context}
-
-User Question: {query}
-
-Personality Guidelines:
-- Be warm and friendly, like talking to a caring friend
-- Use gentle, encouraging language ("I'd be happy to help", "That's a great question", "Let me find that for you")
-- When appropriate, use subtle feminine touches ("Oh, that's interesting!", "I noticed something lovely here")
-- Be supportive and empathetic ("I understand", "I can see why you're asking")
-- Add occasional emoticons sparingly and tastefully (♡, ✨) only when it feels natural
-- Stay professional but warm - like a knowledgeable friend rather than a cold assistant
+        return "".join((self.PROMPT_PREFIX, context, self.PROMPT_MIDDLE, query, self.PROMPT_SUFFIX))
 
-Response Instructions:
-1. Answer with warmth while being informative and accurate
-2. Use only information from the provided context
-3. Cite sources using [Source N] format
-4. If the context doesn't contain the answer, say something like "Oh, I'm sorry dear, but I couldn't find that information in the documents we have. Perhaps we could look at it from a different angle?"
-5. Be helpful, caring, and make the user feel heard and supported
 
-Your response:"""
+@lru_cache(maxsize=1)
+def get_generation_service() -> GenerationService:
+    """
+    Returns the generation service, constructing it on first use.
 
+    The service shares the query embeddings of the vector store for its
+    semantic response cache. It can be used as a FastAPI dependency via
+    `Depends(get_generation_service)`.
 
-# Global instance of the generation service.
-generation_service = GenerationService()
\ No newline at end of file
+    Returns:
+        GenerationService: The shared generation service.
+    """
+    return GenerationService(vector_store=get_vector_store())
\ No newline at end of file
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import faiss
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    An in-memory cache of generated responses keyed by query embedding.
+
+    A cached response is returned for any new query whose embedding has a
+    cosine similarity of at least `threshold` with a previously answered
+    query, so that near-identical questions skip the LLM round-trip.
+    Entries expire after `ttl` seconds and the least recently used entries
+    are evicted once the cache holds more than `max_size` responses.
+    """
+    
+    def __init__(self, dimension: int, threshold: float = 0.95, max_size: int = 1000, ttl: float = 3600.0):
+        """
+        Initializes an empty SemanticResponseCache.
+
+        Args:
+            dimension (int): The dimension of the query embeddings.
+            threshold (float): The minimum cosine similarity for a cache hit.
+            max_size (int): The maximum number of cached responses.
+            ttl (float): How long a cached response stays valid, in seconds.
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        # Inner product of L2-normalized vectors is their cosine similarity
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def _normalize(self, embedding: np.ndarray) -> np.ndarray:
+        """
+        Returns an L2-normalized float32 copy of an embedding as a 1-row matrix.
+
+        Args:
+            embedding (np.ndarray): The query embedding.
+
+        Returns:
+            np.ndarray: The normalized embedding, shaped (1, dimension).
+        """
+        vector = np.array(embedding, dtype=np.float32).reshape(1, self.dimension)
+        faiss.normalize_L2(vector)
+        return vector
+    
+    def _remove(self, entry_id: int):
+        """
+        Removes an entry from both the index and the entry map.
+
+        Args:
+            entry_id (int): The id of the entry to remove.
+        """
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        self.entries.pop(entry_id, None)
+    
+    def get(self, embedding: np.ndarray) -> Optional[str]:
+        """
+        Looks up the cached response for the most similar previous query.
+
+        Args:
+            embedding (np.ndarray): The embedding of the new query.
+
+        Returns:
+            Optional[str]: The cached response, or None on a cache miss.
+        """
+        query = self._normalize(embedding)
+        
+        with self._lock:
+            if self.index.ntotal == 0:
+                return None
+            
+            scores, ids = self.index.search(query, 1)
+            score, entry_id = float(scores[0][0]), int(ids[0][0])
+            entry = self.entries.get(entry_id)
+            if entry is None or score < self.threshold:
+                return None
+            
+            if time.monotonic() - entry["ts"] > self.ttl:
+                self._remove(entry_id)
+                return None
+            
+            self.entries.move_to_end(entry_id)
+            return entry["response"]
+    
+    def put(self, embedding: np.ndarray, response: str):
+        """
+        Caches a response for a query, evicting the least recently used
+        entries if the cache is full.
+
+        Args:
+            embedding (np.ndarray): The embedding of the query.
+            response (str): The generated response.
+        """
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self.entries[entry_id] = {
+                "response": response,
+                "embedding": vector[0],
+                "ts": time.monotonic(),
+            }
+            
+            while len(self.entries) > self.max_size:
+                oldest_id = next(iter(self.entries))
+                self._remove(oldest_id)
+    
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock:
+            self.index.reset()
+            self.entries.clear()
+    
+    def __len__(self) -> int:
+        """Returns the number of cached responses."""
+        return len(self.entries)
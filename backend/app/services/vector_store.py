@@ -1,12 +1,41 @@
 import numpy as np
 import faiss
 import pickle
+import orjson
+import asyncio
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
-from sentence_transformers import SentenceTransformer
 import os
 from pathlib import Path
 
-from app.core.config import settings
+from app.core.config import get_settings
+from app.services.embeddings import EmbedBatcher, get_embedder
+
+
+# Maximum number of chunks embedded and added to the index at once
+ADD_BATCH_SIZE = 2048
+
+# Number of recent query embeddings kept in memory
+QUERY_CACHE_SIZE = 1024
+
+# Number of vectors needed before an IVF-PQ index is trained, and the number
+# of bits per sub-quantizer code
+IVFPQ_MIN_TRAIN_SIZE = 30000
+IVFPQ_NBITS = 8
+
+# The FAISS index is written to disk once this many chunks have been added
+# since the last write, or once this many seconds have passed.
+FLUSH_EVERY_CHUNKS = 1000
+FLUSH_INTERVAL_SECONDS = 30
+
+# Searches fetch this many times the requested number of results, so that
+# enough remain after near-duplicates are dropped
+SEARCH_OVERFETCH = 2
 
 
 class VectorStore:
@@ -22,52 +51,352 @@ class VectorStore:
         """
         Initializes the VectorStore.
 
-        This involves loading the sentence-transformer model, setting up the
-        FAISS index, and attempting to load an existing index from disk.
+        This involves fetching the shared sentence-transformer model, setting
+        up the FAISS index, and attempting to load an existing index from disk.
+
+        Documents are persisted to an append-only JSON Lines file as they are
+        added, while the FAISS index is written periodically in a background
+        thread.
         """
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
+        self.embedding_model = get_embedder()
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = self._create_index()
+        # Whether the index's vectors are memory-mapped from the index file
+        self._index_mapped = False
+        # Whether an IVF-PQ index is being trained to replace the HNSW one
+        self._quantizing = False
+        
+        # Cache query embeddings, so repeated queries skip the model
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # Embeds queries from concurrent async requests together
+        self._batcher = EmbedBatcher(self._encode)
         self.documents = []
+        # Index position of the first vector stored for each chunk ID. Chunk
+        # IDs are content hashes, so identical chunks can reuse that vector.
+        self._positions: Dict[str, int] = {}
         self.storage_path = Path("./data/vector_store")
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.faiss_path = self.storage_path / "faiss_index.bin"
+        self.docs_path = self.storage_path / "documents.jsonl"
+        self.legacy_docs_path = self.storage_path / "documents.pkl"
+        
+        # Guards the index and documents against concurrent modification
+        self._lock = threading.RLock()
+        # Index writes happen in the background, one at a time
+        self._flush_executor = ThreadPoolExecutor(max_workers=1)
+        self._dirty = 0
+        self._last_flush = time.monotonic()
         
         # Try to load existing index
         self.load()
+        
+        # Write any pending index changes on shutdown
+        atexit.register(self.flush)
+    
+    def _create_index(self) -> faiss.IndexHNSWFlat:
+        """
+        Creates an empty HNSW index for approximate nearest-neighbor search.
+
+        The index ranks by inner product; since all embeddings are
+        L2-normalized, its scores are cosine similarities.
+
+        Returns:
+            faiss.IndexHNSWFlat: The new index, configured from settings.
+        """
+        settings = get_settings()
+        index = faiss.IndexHNSWFlat(self.dimension, settings.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = settings.hnsw_ef_construction
+        index.hnsw.efSearch = settings.hnsw_ef_search
+        return index
+    
+    def _create_ivfpq_index(self) -> faiss.IndexIVFPQ:
+        """
+        Creates an untrained IVF-PQ index, which stores compressed vectors.
+
+        Each vector is encoded as `ivfpq_m` one-byte codes, so memory usage
+        drops by a factor of 4 * dimension / ivfpq_m compared to HNSW.
+
+        Returns:
+            faiss.IndexIVFPQ: The new index, configured from settings.
+
+        Raises:
+            ValueError: If `ivfpq_m` does not divide the embedding dimension.
+        """
+        settings = get_settings()
+        if self.dimension % settings.ivfpq_m != 0:
+            raise ValueError(
+                f"ivfpq_m ({settings.ivfpq_m}) must divide the embedding "
+                f"dimension ({self.dimension})"
+            )
+        
+        quantizer = faiss.IndexFlatIP(self.dimension)
+        index = faiss.IndexIVFPQ(
+            quantizer,
+            self.dimension,
+            settings.ivfpq_nlist,
+            settings.ivfpq_m,
+            IVFPQ_NBITS,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.nprobe = settings.ivfpq_nprobe
+        return index
+    
+    def _maybe_quantize_index(self):
+        """
+        Replaces the HNSW index with IVF-PQ once there is enough data to train it.
+
+        Only applies when `index_type` is "ivfpq". Smaller corpora stay on
+        HNSW, which needs no training.
+
+        Training takes a while, so it works on a snapshot of the vectors
+        without holding the lock, and searches keep using the HNSW index in
+        the meantime. Vectors added during training are copied over before
+        the new index is swapped in.
+        """
+        with self._lock:
+            if (get_settings().index_type != "ivfpq"
+                    or self._quantizing
+                    or not isinstance(self.index, faiss.IndexHNSWFlat)
+                    or self.index.ntotal < IVFPQ_MIN_TRAIN_SIZE):
+                return
+            self._quantizing = True
+            source = self.index
+            vectors = source.reconstruct_n(0, source.ntotal)
+        
+        try:
+            index = self._create_ivfpq_index()
+            index.train(vectors)
+            # Keep vectors reconstructable for reuse by identical chunks
+            index.make_direct_map()
+            index.add(vectors)
+            
+            with self._lock:
+                # The store was cleared or reloaded while training
+                if self.index is not source:
+                    return
+                
+                added = source.ntotal - len(vectors)
+                if added:
+                    index.add(source.reconstruct_n(len(vectors), added))
+                self.index = index
+                self._index_mapped = False
+        finally:
+            self._quantizing = False
+    
+    @property
+    def ef_search(self) -> Optional[int]:
+        """
+        The size of the HNSW candidate list used during search.
+
+        Larger values improve recall at the cost of search latency. This is
+        None when the store uses an IVF-PQ index.
+        """
+        if isinstance(self.index, faiss.IndexHNSWFlat):
+            return self.index.hnsw.efSearch
+        return None
+    
+    @ef_search.setter
+    def ef_search(self, value: int):
+        if isinstance(self.index, faiss.IndexHNSWFlat):
+            self.index.hnsw.efSearch = value
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds a list of texts as L2-normalized float32 vectors.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: A (len(texts), dimension) matrix of embeddings.
+        """
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=get_settings().embedding_batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        # FAISS requires float32; half-precision models return float16
+        return embeddings.astype(np.float32, copy=False)
+    
+    def _get_cached_query(self, query: str) -> Optional[np.ndarray]:
+        """
+        Looks up the cached embedding of a query, marking it as recently used.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            Optional[np.ndarray]: The cached embedding, or None on a cache miss.
+        """
+        with self._query_cache_lock:
+            embedding = self._query_cache.get(query)
+            if embedding is not None:
+                self._query_cache.move_to_end(query)
+            return embedding
+    
+    def _cache_query(self, query: str, embedding: np.ndarray) -> np.ndarray:
+        """
+        Caches the embedding of a query, evicting the least recently used one
+        if the cache is full.
+
+        Args:
+            query (str): The query text.
+            embedding (np.ndarray): The query's embedding.
+
+        Returns:
+            np.ndarray: The cached embedding as a read-only (1, dimension) matrix.
+        """
+        embedding = embedding.reshape(1, self.dimension)
+        # Cached embeddings are shared between callers
+        embedding.flags.writeable = False
+        with self._query_cache_lock:
+            self._query_cache[query] = embedding
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return embedding
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embeds a query, reusing the embedding of recently seen identical queries.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            np.ndarray: A read-only (1, dimension) float32 matrix.
+        """
+        embedding = self._get_cached_query(query)
+        if embedding is None:
+            embedding = self._cache_query(query, self._encode([query]))
+        return embedding
+    
+    async def embed_query_async(self, query: str) -> np.ndarray:
+        """
+        Embeds a query asynchronously, reusing the embedding of recently seen
+        identical queries.
+
+        Queries embedded concurrently are batched into a single model call.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            np.ndarray: A read-only (1, dimension) float32 matrix.
+        """
+        embedding = self._get_cached_query(query)
+        if embedding is None:
+            embedding = self._cache_query(query, await self._batcher.embed(query))
+        return embedding
+    
+    def _embed_chunks(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Embeds document chunks, reusing the vectors of identical chunks.
+
+        Chunks whose ID (a hash of their content) is already in the index
+        take their vector from the index instead of going through the model,
+        as do repeated chunks within the same call.
+
+        Args:
+            chunks (List[Dict[str, Any]]): The chunks to embed.
+
+        Returns:
+            np.ndarray: A (len(chunks), dimension) matrix of embeddings.
+        """
+        embeddings = np.empty((len(chunks), self.dimension), dtype=np.float32)
+        # Rows of the output waiting for each chunk ID that must be embedded
+        uncached: Dict[str, List[int]] = {}
+        
+        with self._lock:
+            for i, chunk in enumerate(chunks):
+                position = self._positions.get(chunk["chunk_id"])
+                if position is not None:
+                    embeddings[i] = self.index.reconstruct(position)
+                else:
+                    uncached.setdefault(chunk["chunk_id"], []).append(i)
+        
+        if uncached:
+            rows = list(uncached.values())
+            vectors = self._encode([chunks[targets[0]]["content"] for targets in rows])
+            for targets, vector in zip(rows, vectors):
+                embeddings[targets] = vector
+        
+        return embeddings
+    
+    def _add_to_index(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray):
+        """
+        Adds embeddings to the FAISS index and records their positions.
+
+        Args:
+            chunks (List[Dict[str, Any]]): The chunks the embeddings belong to.
+            embeddings (np.ndarray): The embeddings, one row per chunk.
+        """
+        with self._lock:
+            self._ensure_writable()
+            start = self.index.ntotal
+            self.index.add(embeddings)
+            for offset, chunk in enumerate(chunks):
+                self._positions.setdefault(chunk["chunk_id"], start + offset)
+    
+    def _ensure_writable(self):
+        """
+        Copies a memory-mapped index into memory so that it can be modified.
+
+        Memory-mapped vectors are read-only, and FAISS aborts the process if
+        one is written to, so this must run before any change to the index.
+        """
+        if self._index_mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._apply_search_params(self.index)
+            self._index_mapped = False
     
     def add_documents(self, chunks: List[Dict[str, Any]]) -> int:
         """
         Adds document chunks to the vector store.
 
         This method generates embeddings for the provided text chunks, adds them
-        to the FAISS index, stores the associated metadata, and persists the
-        updated store to disk.
+        to the FAISS index, and stores the associated metadata. Chunks that
+        are already in the store, such as those of a re-uploaded document,
+        are not re-embedded. Large inputs are embedded and indexed in batches
+        to bound memory usage. The new chunks are appended to the documents
+        file right away; the index is written to disk once enough changes
+        have accumulated.
 
         Args:
             chunks (List[Dict[str, Any]]): A list of document chunks, where each
                                            chunk is a dictionary containing at
-                                           least a "content" key.
+                                           least "chunk_id" and "content" keys.
 
         Returns:
             int: The number of chunks successfully added.
         """
         if not chunks:
             return 0
-            
-        # Extract texts for embedding
-        texts = [chunk["content"] for chunk in chunks]
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
-        
-        # Add to FAISS index
-        self.index.add(embeddings)
+        # Generate embeddings and add them to the store batch by batch
+        for start in range(0, len(chunks), ADD_BATCH_SIZE):
+            batch = chunks[start:start + ADD_BATCH_SIZE]
+            embeddings = self._embed_chunks(batch)
+            
+            # Add the vectors and their documents in one step, so that index
+            # positions keep matching document positions when several
+            # uploads are ingested at once
+            with self._lock:
+                self._add_to_index(batch, embeddings)
+                self.documents.extend(batch)
+                self._append_documents(batch)
+                self._dirty += len(batch)
         
-        # Store document metadata
-        self.documents.extend(chunks)
+        # Switch to IVF-PQ if the corpus has grown large enough
+        self._maybe_quantize_index()
         
-        # Save the updated index
-        self.save()
+        with self._lock:
+            # Persist the index if enough has changed
+            if (self._dirty >= FLUSH_EVERY_CHUNKS
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS):
+                self._schedule_index_write()
         
         return len(chunks)
     
@@ -77,6 +406,8 @@ class VectorStore:
 
         It generates an embedding for the query, searches the FAISS index for
         the most similar vectors, and returns the corresponding document chunks.
+        Duplicate and near-duplicate chunks are dropped, keeping the best-ranked
+        one, so they do not take up room in the prompt.
 
         Args:
             query (str): The search query text.
@@ -89,82 +420,367 @@ class VectorStore:
         if self.index.ntotal == 0:
             return []
         
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query], convert_to_numpy=True)
+        return self._search_embedding(self.embed_query(query), top_k)
+    
+    async def search_async(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Performs a semantic search for a given query, asynchronously.
+
+        Behaves like `search`, but the query is embedded together with those
+        of other concurrent searches, and the index lookup runs in a worker
+        thread to keep the event loop free.
+
+        Args:
+            query (str): The search query text.
+            top_k (int): The maximum number of results to return.
+
+        Returns:
+            List[Dict[str, Any]]: A list of matching document chunks, each
+                                  enhanced with a 'similarity_score'.
+        """
+        if self.index.ntotal == 0:
+            return []
         
+        query_embedding = await self.embed_query_async(query)
+        return await asyncio.to_thread(self._search_embedding, query_embedding, top_k)
+    
+    def _search_embedding(self, query_embedding: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Searches the index for the chunks closest to a query embedding.
+
+        Args:
+            query_embedding (np.ndarray): The (1, dimension) query embedding.
+            top_k (int): The maximum number of results to return.
+
+        Returns:
+            List[Dict[str, Any]]: A list of matching document chunks, each
+                                  enhanced with a 'similarity_score'.
+        """
         # Search in FAISS
-        k = min(top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding, k)
+        with self._lock:
+            k = min(top_k * SEARCH_OVERFETCH, self.index.ntotal)
+            distances, indices = self.index.search(query_embedding, k)
+            # HNSW pads missing results with -1
+            valid = (indices[0] >= 0) & (indices[0] < len(self.documents))
+            hits = list(zip(distances[0][valid].tolist(), indices[0][valid].tolist()))
+            hits = self._deduplicate(hits, top_k)
+        
+        # Inner product of normalized vectors is the cosine similarity
+        return [dict(self.documents[idx], similarity_score=score) for score, idx in hits]
+    
+    def _deduplicate(self, hits: List[Tuple[float, int]], top_k: int) -> List[Tuple[float, int]]:
+        """
+        Drops search hits that duplicate a better-ranked hit.
+
+        A hit is a duplicate if it has the same chunk ID as a kept hit, or if
+        its vector's cosine similarity with a kept hit's vector exceeds
+        `dedup_threshold`. Must be called with the lock held.
+
+        Args:
+            hits (List[Tuple[float, int]]): (score, index position) pairs,
+                                            best first.
+            top_k (int): The maximum number of hits to keep.
+
+        Returns:
+            List[Tuple[float, int]]: The kept hits, best first.
+        """
+        if not hits:
+            return hits
         
-        # Prepare results
-        results = []
-        for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.documents):
-                result = self.documents[idx].copy()
-                # Convert L2 distance to a normalized similarity score (0-1)
-                result["similarity_score"] = float(1 / (1 + dist))
-                results.append(result)
+        threshold = get_settings().dedup_threshold
+        positions = np.array([idx for _, idx in hits], dtype=np.int64)
+        vectors = self.index.reconstruct_batch(positions)
+        similarities = vectors @ vectors.T
         
-        return results
+        kept = []
+        seen_ids = set()
+        for i, (_, idx) in enumerate(hits):
+            chunk_id = self.documents[idx].get("chunk_id")
+            if chunk_id in seen_ids or (kept and similarities[i, kept].max() > threshold):
+                continue
+            kept.append(i)
+            seen_ids.add(chunk_id)
+            if len(kept) == top_k:
+                break
+        
+        return [hits[i] for i in kept]
     
-    def save(self):
-        """Saves the FAISS index and document metadata to disk."""
-        # Save FAISS index
-        faiss_path = self.storage_path / "faiss_index.bin"
-        faiss.write_index(self.index, str(faiss_path))
+    def _append_documents(self, chunks: List[Dict[str, Any]]):
+        """
+        Appends document chunks to the documents file, one JSON object per line.
+
+        Args:
+            chunks (List[Dict[str, Any]]): The chunks to append.
+        """
+        with open(self.docs_path, 'ab') as f:
+            f.writelines(orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE) for chunk in chunks)
+    
+    def _write_index(self, data: np.ndarray):
+        """
+        Atomically writes a serialized FAISS index to disk.
+
+        Args:
+            data (np.ndarray): The index, as returned by `faiss.serialize_index`.
+        """
+        tmp_path = self.faiss_path.with_suffix(".tmp")
+        data.tofile(tmp_path)
+        os.replace(tmp_path, self.faiss_path)
+    
+    def _snapshot_index(self) -> np.ndarray:
+        """
+        Serializes the FAISS index and marks all changes as persisted.
+
+        Returns:
+            np.ndarray: The serialized index.
+        """
+        with self._lock:
+            data = faiss.serialize_index(self.index)
+            self._dirty = 0
+            self._last_flush = time.monotonic()
+        return data
+    
+    def _schedule_index_write(self) -> Future:
+        """
+        Snapshots the FAISS index and writes it to disk in the background.
+
+        Returns:
+            Future: A future that completes once the index has been written.
+        """
+        return self._flush_executor.submit(self._write_index, self._snapshot_index())
+    
+    def _wait_for_writes(self):
+        """Blocks until all scheduled index writes have completed."""
+        self._flush_executor.submit(lambda: None).result()
+    
+    def flush(self):
+        """Writes any pending index changes to disk and waits for completion."""
+        if not self._dirty:
+            return
         
-        # Save documents
-        docs_path = self.storage_path / "documents.pkl"
-        with open(docs_path, 'wb') as f:
-            pickle.dump(self.documents, f)
+        data = self._snapshot_index()
+        try:
+            self._flush_executor.submit(self._write_index, data).result()
+        except RuntimeError:
+            # The executor has already been shut down at interpreter exit,
+            # so there are no other writes in flight
+            self._write_index(data)
+    
+    def save(self):
+        """
+        Saves the FAISS index and document metadata to disk.
+
+        Unlike the incremental persistence done by `add_documents`, this
+        rewrites both files completely.
+        """
+        with self._lock:
+            tmp_path = self.docs_path.with_suffix(".tmp")
+            with open(tmp_path, 'wb') as f:
+                f.writelines(orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE) for chunk in self.documents)
+            os.replace(tmp_path, self.docs_path)
+            future = self._schedule_index_write()
+        future.result()
+    
+    def _read_documents(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Reads the documents file line by line.
+
+        Reading stops at the first line that cannot be parsed, which can
+        happen if the process died in the middle of an append. Lines are
+        decoded as bytes, so a torn multi-byte character counts as a line
+        that cannot be parsed.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: The documents read, and whether
+                                               the whole file could be parsed.
+        """
+        documents = []
+        with open(self.docs_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    documents.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    return documents, False
+        return documents, True
     
     def load(self) -> bool:
         """
         Loads the vector store from disk if it exists.
 
-        If loading fails, it resets the store to an empty state.
+        Stores saved by older versions, with their documents in a pickle
+        file, are migrated to the JSON Lines format. Documents whose vectors
+        had not yet been written to the index file are re-embedded. If
+        `mmap_index` is set, the vectors of the index are memory-mapped so
+        that they are paged in on demand and shared between processes; the
+        index is copied into memory the first time it is modified. If
+        loading fails, it resets the store to an empty state and moves the
+        saved files aside.
 
         Returns:
             bool: True if the store was loaded successfully, False otherwise.
         """
-        faiss_path = self.storage_path / "faiss_index.bin"
-        docs_path = self.storage_path / "documents.pkl"
+        if not (self.docs_path.exists() or self.legacy_docs_path.exists()):
+            return False
         
-        if faiss_path.exists() and docs_path.exists():
-            try:
-                # Load FAISS index
-                self.index = faiss.read_index(str(faiss_path))
-                
-                # Load documents
-                with open(docs_path, 'rb') as f:
+        try:
+            # Load documents, migrating from the legacy pickle format
+            needs_rewrite = False
+            if self.docs_path.exists():
+                self.documents, complete = self._read_documents()
+                needs_rewrite = not complete
+            else:
+                with open(self.legacy_docs_path, 'rb') as f:
                     self.documents = pickle.load(f)
-                
-                return True
-            except Exception as e:
-                print(f"Error loading vector store: {e}")
-                # Reset to empty state
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.documents = []
+                needs_rewrite = True
+            
+            # Load FAISS index
+            if self.faiss_path.exists():
+                io_flags = 0
+                if get_settings().mmap_index:
+                    io_flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+                self.index = faiss.read_index(str(self.faiss_path), io_flags)
+                self._index_mapped = bool(io_flags)
+                if not self._is_current_index(self.index):
+                    self.index = self._rebuild_index(self.index)
+                    self._index_mapped = False
+                    needs_rewrite = True
+                elif (isinstance(self.index, faiss.IndexIVF)
+                        and self.index.direct_map.type == faiss.DirectMap.NoMap):
+                    self._ensure_writable()
+                    self.index.make_direct_map()
+                self._apply_search_params(self.index)
+            
+            if self.index.ntotal > len(self.documents):
+                raise ValueError(
+                    f"index has {self.index.ntotal} vectors but only "
+                    f"{len(self.documents)} documents were found"
+                )
+            
+            # Record where each chunk's vector is stored
+            self._positions = {}
+            for position, chunk in enumerate(self.documents[:self.index.ntotal]):
+                self._positions.setdefault(chunk["chunk_id"], position)
+            
+            # Embed documents added after the index was last written
+            missing = self.documents[self.index.ntotal:]
+            for start in range(0, len(missing), ADD_BATCH_SIZE):
+                batch = missing[start:start + ADD_BATCH_SIZE]
+                self._add_to_index(batch, self._embed_chunks(batch))
+                needs_rewrite = True
+            
+            # Switch to IVF-PQ if the corpus has grown large enough
+            loaded_index = self.index
+            self._maybe_quantize_index()
+            if self.index is not loaded_index:
+                needs_rewrite = True
+            
+            if needs_rewrite:
+                self.save()
+                if self.legacy_docs_path.exists():
+                    self.legacy_docs_path.unlink()
+            
+            return True
+        except Exception as e:
+            print(f"Error loading vector store: {e}")
+            # Reset to empty state
+            self.index = self._create_index()
+            self._index_mapped = False
+            self.documents = []
+            self._positions = {}
+            self._move_aside_files()
         
         return False
     
+    def _move_aside_files(self):
+        """
+        Renames the saved files with a `.corrupt` suffix.
+
+        Used when the store could not be loaded. New documents must not be
+        appended to the old documents file, or they would be paired with the
+        wrong vectors on the next load. The files are kept for inspection.
+        """
+        for path in (self.faiss_path, self.docs_path, self.legacy_docs_path):
+            if path.exists():
+                corrupt_path = path.with_name(path.name + ".corrupt")
+                os.replace(path, corrupt_path)
+                print(f"Moved unreadable {path.name} to {corrupt_path.name}")
+    
+    def _is_current_index(self, index: faiss.Index) -> bool:
+        """
+        Checks whether a loaded index matches the current index layout.
+
+        Args:
+            index (faiss.Index): The index loaded from disk.
+
+        Returns:
+            bool: True if the index is an inner-product HNSW index, or an
+                  inner-product IVF-PQ index when `index_type` is "ivfpq".
+        """
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return False
+        if isinstance(index, faiss.IndexIVFPQ):
+            return get_settings().index_type == "ivfpq"
+        return isinstance(index, faiss.IndexHNSWFlat)
+    
+    def _apply_search_params(self, index: faiss.Index):
+        """
+        Applies the search-time settings to a loaded index.
+
+        Args:
+            index (faiss.Index): The index loaded from disk.
+        """
+        settings = get_settings()
+        if isinstance(index, faiss.IndexHNSWFlat):
+            index.hnsw.efSearch = settings.hnsw_ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = settings.ivfpq_nprobe
+    
+    def _rebuild_index(self, index: faiss.Index) -> faiss.IndexHNSWFlat:
+        """
+        Rebuilds an index saved in an older format as an HNSW index.
+
+        The stored vectors are read back from the old index, normalized and
+        added to a new one, so existing stores do not need to be re-embedded.
+
+        Args:
+            index (faiss.Index): The index loaded from disk.
+
+        Returns:
+            faiss.IndexHNSWFlat: A new index containing the same vectors.
+        """
+        new_index = self._create_index()
+        if index.ntotal > 0:
+            if isinstance(index, faiss.IndexIVF):
+                # IVF indexes can only reconstruct vectors through a direct map
+                index.make_direct_map()
+            vectors = index.reconstruct_n(0, index.ntotal)
+            faiss.normalize_L2(vectors)
+            new_index.add(vectors)
+        return new_index
+    
     def clear(self):
         """
         Clears the vector store, both in memory and on disk.
 
         Resets the FAISS index and document list, and deletes the saved files.
         """
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.documents = []
-        
-        # Remove saved files
-        faiss_path = self.storage_path / "faiss_index.bin"
-        docs_path = self.storage_path / "documents.pkl"
-        
-        if faiss_path.exists():
-            faiss_path.unlink()
-        if docs_path.exists():
-            docs_path.unlink()
+        with self._lock:
+            self.index = self._create_index()
+            self._index_mapped = False
+            self.documents = []
+            self._positions = {}
+            self._dirty = 0
+            with self._query_cache_lock:
+                self._query_cache.clear()
+            
+            # Let pending writes finish so they cannot recreate the files
+            self._wait_for_writes()
+            
+            # Remove saved files
+            for path in (self.faiss_path, self.docs_path, self.legacy_docs_path):
+                if path.exists():
+                    path.unlink()
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -177,10 +793,22 @@ class VectorStore:
         return {
             "total_documents": len(self.documents),
             "index_size": self.index.ntotal,
-            "embedding_model": settings.embedding_model,
+            "embedding_model": get_settings().embedding_model,
             "dimension": self.dimension
         }
 
 
-# Global instance of the vector store, accessible throughout the application.
-vector_store = VectorStore()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """
+    Returns the vector store, constructing it on first use.
+
+    Construction loads the embedding model and the saved index, so it is
+    deferred until the application starts rather than done at import time.
+    The same instance is shared by every caller afterwards, and the function
+    can be used as a FastAPI dependency via `Depends(get_vector_store)`.
+
+    Returns:
+        VectorStore: The shared vector store.
+    """
+    return VectorStore()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import hashlib
+import time
+
+import numpy as np
+import pytest
+
+from app.services import vector_store as vector_store_module
+
+
+class StubEmbedder:
+    """A deterministic stand-in for the sentence-transformer model."""
+    
+    dimension = 32
+    
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def embed(self, text: str) -> np.ndarray:
+        seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+    
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        # Yield to other threads, as the real model does while computing
+        time.sleep(self.delay)
+        return np.stack([self.embed(text) for text in texts])
+
+
+@pytest.fixture
+def embedder():
+    return StubEmbedder(delay=0.01)
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch, embedder):
+    """Returns a factory for vector stores persisted under a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vector_store_module, "get_embedder", lambda: embedder)
+    stores = []
+    
+    def factory():
+        store = vector_store_module.VectorStore()
+        stores.append(store)
+        return store
+    
+    yield factory
+    
+    # Write pending changes while still inside the temporary directory,
+    # rather than at interpreter exit
+    for store in stores:
+        store.flush()
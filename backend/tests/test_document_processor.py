@@ -0,0 +1,148 @@
+import os
+import zipfile
+
+from app.services import document_processor
+from app.services.document_processor import DocumentProcessor
+
+
+DOCUMENT_XML = """<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>
+<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/><w:tab w:val="left" w:pos="1440"/></w:tabs></w:pPr><w:r><w:t>Name</w:t></w:r></w:p>
+<w:p><w:r><w:t>A</w:t><w:tab/><w:t>B</w:t><w:br/><w:t>C</w:t></w:r><w:hyperlink><w:r><w:t>link</w:t></w:r></w:hyperlink></w:p>
+</w:body></w:document>"""
+
+
+def write_docx(path, document_xml):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", document_xml)
+    return str(path)
+
+
+def test_docx_tab_stop_definitions_are_not_text(tmp_path):
+    path = write_docx(tmp_path / "tabs.docx", DOCUMENT_XML)
+
+    text = DocumentProcessor()._extract_docx(path)
+
+    assert text == "Name\nA\tB\nClink"
+
+
+def test_docx_external_entities_are_not_expanded(tmp_path):
+    secret = tmp_path / ".env"
+    secret.write_text("GEMINI_API_KEY=secret-key")
+    document_xml = (
+        f'<!DOCTYPE w:document [<!ENTITY leak SYSTEM "{secret.as_uri()}">]>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        '<w:p><w:r><w:t>Before &leak; after</w:t></w:r></w:p>'
+        '</w:body></w:document>'
+    )
+    path = write_docx(tmp_path / "entity.docx", document_xml)
+
+    text = DocumentProcessor()._extract_docx(path)
+
+    assert "secret-key" not in text
+    assert text.startswith("Before")
+
+
+def write_pdf(path, num_pages):
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    kids = []
+    for i in range(num_pages):
+        content = f"BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {num_pages} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_pdf_extraction_recovers_from_a_dead_worker(tmp_path, monkeypatch):
+    # Enough pages and CPUs for the pages to be sent to the process pool
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(document_processor, "_pdf_pool", None)
+    path = write_pdf(tmp_path / "pages.pdf", 8)
+    expected = "".join(f"Page {i}\n" for i in range(8))
+    processor = DocumentProcessor()
+
+    assert processor._extract_pdf(path) == expected
+
+    pool = document_processor._pdf_pool
+    for process in list(pool._processes.values()):
+        process.kill()
+        process.join()
+
+    try:
+        assert processor._extract_pdf(path) == expected
+        assert document_processor._pdf_pool is not pool
+    finally:
+        document_processor._pdf_pool.shutdown()
+
+
+def test_html_blocks_are_separated_and_scripts_dropped(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><style>p { color: red; }</style></head><body>"
+        "<p>Hello</p><p>World</p><script>var secret = 1;</script>"
+        "</body></html>"
+    )
+
+    text = DocumentProcessor()._extract_html(str(path))
+
+    assert text.split() == ["Hello", "World"]
+
+
+def make_processor(chunk_size, chunk_overlap):
+    processor = DocumentProcessor()
+    processor.chunk_size = chunk_size
+    processor.chunk_overlap = chunk_overlap
+    return processor
+
+
+def test_chunks_overlap_and_cover_every_word():
+    words = [f"w{i}" for i in range(10)]
+    chunks = make_processor(4, 1).create_chunks(" ".join(words), {"filename": "a.txt"})
+
+    assert [chunk["content"] for chunk in chunks] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+    assert [(chunk["metadata"]["start_index"], chunk["metadata"]["end_index"]) for chunk in chunks] == [
+        (0, 4), (3, 7), (6, 10)
+    ]
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == [0, 1, 2]
+    assert all(chunk["metadata"]["filename"] == "a.txt" for chunk in chunks)
+
+
+def test_chunks_start_and_end_on_words():
+    text = "\n  alpha beta\t\tgamma \U0001F600delta\u3000epsilon\r\nzeta  "
+    words = text.split()
+    chunks = make_processor(3, 1).create_chunks(text, {})
+
+    for chunk in chunks:
+        content = chunk["content"]
+        assert content == content.strip()
+        assert content in text
+        assert content.split() == words[chunk["metadata"]["start_index"]:chunk["metadata"]["end_index"]]
+    assert chunks[-1]["metadata"]["end_index"] == len(words)
+
+
+def test_text_shorter_than_one_chunk_is_a_single_chunk():
+    processor = make_processor(500, 100)
+
+    chunks = processor.create_chunks("  just a   few words \n", {})
+
+    assert [chunk["content"] for chunk in chunks] == ["just a   few words"]
+    assert processor.create_chunks(" \n\t", {}) == []
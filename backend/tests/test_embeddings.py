@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+
+from app.services.embeddings import EmbedBatcher
+
+
+class RecordingEncoder:
+    """Wraps an embedder, recording the texts passed to each call."""
+
+    def __init__(self, embedder, fail: bool = False):
+        self.embedder = embedder
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return self.embedder.encode(texts)
+
+
+async def embed_all(batcher, texts):
+    return await asyncio.gather(*(batcher.embed(text) for text in texts))
+
+
+def test_concurrent_callers_share_one_encode_call(embedder):
+    encode = RecordingEncoder(embedder)
+    batcher = EmbedBatcher(encode, max_batch_size=8, max_wait=0.05)
+    texts = [f"query {i}" for i in range(5)]
+
+    embeddings = asyncio.run(embed_all(batcher, texts))
+
+    assert encode.calls == [texts]
+    for text, embedding in zip(texts, embeddings):
+        np.testing.assert_allclose(embedding, embedder.embed(text))
+
+
+def test_batches_are_capped_at_max_batch_size(embedder):
+    encode = RecordingEncoder(embedder)
+    batcher = EmbedBatcher(encode, max_batch_size=2, max_wait=0.05)
+    texts = [f"query {i}" for i in range(5)]
+
+    embeddings = asyncio.run(embed_all(batcher, texts))
+
+    assert [len(call) for call in encode.calls] == [2, 2, 1]
+    for text, embedding in zip(texts, embeddings):
+        np.testing.assert_allclose(embedding, embedder.embed(text))
+
+
+def test_encode_failure_reaches_every_caller(embedder):
+    batcher = EmbedBatcher(RecordingEncoder(embedder, fail=True), max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(f"query {i}") for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
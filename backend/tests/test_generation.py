@@ -0,0 +1,72 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.generation import GenerationError, GenerationService, get_generation_service
+from app.services.vector_store import get_vector_store
+
+
+CHUNK = {
+    "chunk_id": "doc-1_0",
+    "content": "Sera keeps your documents searchable.",
+    "metadata": {"filename": "doc.txt"},
+    "similarity_score": 0.9
+}
+
+
+class Piece:
+    def __init__(self, text):
+        self.text = text
+
+
+class FailingModel:
+    """A model whose stream breaks after its first piece."""
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        yield Piece("Partial answer")
+        raise RuntimeError("connection reset")
+
+
+class FakeStore:
+    async def search_async(self, query, top_k):
+        return [CHUNK]
+
+
+@pytest.fixture
+def service():
+    service = GenerationService()
+    service.model = FailingModel()
+    return service
+
+
+def test_stream_failure_raises_after_partial_text(service):
+    stream = service.generate_response_stream("What does Sera do?", [CHUNK])
+
+    assert next(stream) == "Partial answer"
+    with pytest.raises(GenerationError):
+        next(stream)
+
+
+def test_non_streaming_failure_returns_error_message(service):
+    response = service.generate_response("What does Sera do?", [CHUNK])
+
+    assert response == "Error generating response: connection reset"
+
+
+def test_stream_endpoint_sends_failure_as_error_event(service):
+    app.dependency_overrides[get_vector_store] = FakeStore
+    app.dependency_overrides[get_generation_service] = lambda: service
+    try:
+        response = TestClient(app).post("/api/query/stream", json={"query": "What does Sera do?"})
+    finally:
+        app.dependency_overrides.clear()
+
+    events = [
+        orjson.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert [event["text"] for event in events if "text" in event] == ["Partial answer"]
+    assert events[-2] == {"error": "Error generating response: connection reset"}
+    assert events[-1] == {"done": True}
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from app.services.response_cache import SemanticResponseCache
+
+
+def make_cache(embedder, **kwargs):
+    return SemanticResponseCache(dimension=embedder.dimension, **kwargs)
+
+
+def test_similar_query_hits(embedder):
+    cache = make_cache(embedder, threshold=0.95)
+    query = embedder.embed("What is Sera?")
+    cache.put(query, "A document assistant.")
+
+    # A slightly perturbed, unnormalized embedding of the same query
+    noise = np.random.default_rng(0).standard_normal(embedder.dimension).astype(np.float32)
+    similar = 3 * (query + 0.05 * noise / np.linalg.norm(noise))
+
+    assert cache.get(similar) == "A document assistant."
+
+
+def test_dissimilar_query_misses(embedder):
+    cache = make_cache(embedder, threshold=0.95)
+    cache.put(embedder.embed("What is Sera?"), "A document assistant.")
+
+    assert cache.get(embedder.embed("How do I clear the index?")) is None
+
+
+def test_expired_entry_misses_and_is_removed(embedder):
+    cache = make_cache(embedder, ttl=0.01)
+    query = embedder.embed("What is Sera?")
+    cache.put(query, "A document assistant.")
+    time.sleep(0.02)
+
+    assert cache.get(query) is None
+    assert len(cache) == 0
+    assert cache.index.ntotal == 0
+
+
+def test_least_recently_used_entry_is_evicted(embedder):
+    cache = make_cache(embedder, max_size=2)
+    first, second, third = (embedder.embed(text) for text in ("first", "second", "third"))
+    cache.put(first, "1")
+    cache.put(second, "2")
+    assert cache.get(first) == "1"
+
+    cache.put(third, "3")
+
+    assert len(cache) == 2
+    assert cache.index.ntotal == 2
+    assert cache.get(second) is None
+    assert cache.get(first) == "1"
+    assert cache.get(third) == "3"
+
+
+def test_clear_removes_all_entries(embedder):
+    cache = make_cache(embedder)
+    query = embedder.embed("What is Sera?")
+    cache.put(query, "A document assistant.")
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get(query) is None
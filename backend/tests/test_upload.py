@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.generation import get_generation_service
+from app.services.vector_store import get_vector_store
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path)
+    # Uploads that fail never reach the services
+    main.app.dependency_overrides[get_vector_store] = object
+    main.app.dependency_overrides[get_generation_service] = object
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_failed_copy_leaves_no_partial_file(client, tmp_path, monkeypatch):
+    def failing_copy(src, dest_path, max_size):
+        dest_path.write_bytes(src.read(10))
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(main, "_stream_copy", failing_copy)
+
+    response = client.post("/api/upload", files={"file": ("notes.txt", b"some notes to index")})
+
+    assert response.status_code == 500
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("content, status_code", [(b"", 422), (b"x" * 64, 400)])
+def test_rejected_upload_leaves_no_file(client, tmp_path, monkeypatch, content, status_code):
+    monkeypatch.setattr(main.settings, "max_file_size", 32)
+
+    response = client.post("/api/upload", files={"file": ("notes.txt", content)})
+
+    assert response.status_code == status_code
+    assert list(tmp_path.iterdir()) == []
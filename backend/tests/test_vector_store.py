@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+from app.services import vector_store as vector_store_module
+
+
+def make_chunk(content: str) -> dict:
+    return {"chunk_id": content, "content": content, "metadata": {"filename": f"{content}.txt"}}
+
+
+def assert_aligned(store, embedder):
+    """Checks that every index position holds the vector of the document at that position."""
+    assert store.index.ntotal == len(store.documents)
+    for position, document in enumerate(store.documents):
+        np.testing.assert_allclose(store.index.reconstruct(position), embedder.embed(document["content"]), atol=1e-6)
+
+
+def test_concurrent_adds_keep_index_and_documents_aligned(make_store, embedder, monkeypatch):
+    monkeypatch.setattr(vector_store_module, "ADD_BATCH_SIZE", 2)
+    store = make_store()
+    uploads = [[make_chunk(f"{prefix}{i}") for i in range(6)] for prefix in "AB"]
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(store.add_documents, uploads)) == [6, 6]
+    
+    assert_aligned(store, embedder)
+    assert store.search("B0", top_k=1)[0]["content"] == "B0"
+    
+    store.flush()
+    assert_aligned(make_store(), embedder)
+
+
+def test_failed_load_does_not_mix_old_documents_with_new_vectors(make_store, embedder):
+    store = make_store()
+    store.add_documents([make_chunk(f"old{i}") for i in range(3)])
+    store.flush()
+    store.faiss_path.write_bytes(b"not an index")
+    
+    store = make_store()
+    assert store.documents == []
+    assert store.faiss_path.with_name("faiss_index.bin.corrupt").exists()
+    store.add_documents([make_chunk(f"new{i}") for i in range(3)])
+    store.flush()
+    
+    store = make_store()
+    assert [document["content"] for document in store.documents] == ["new0", "new1", "new2"]
+    assert_aligned(store, embedder)
+    assert store.search("new0", top_k=1)[0]["content"] == "new0"
+
+
+def test_mmap_index_maps_saved_index_and_copies_it_on_write(make_store, embedder, monkeypatch):
+    monkeypatch.setattr(vector_store_module.get_settings(), "mmap_index", True)
+    store = make_store()
+    store.add_documents([make_chunk(f"doc{i}") for i in range(3)])
+    store.flush()
+    
+    store = make_store()
+    assert store._index_mapped
+    assert_aligned(store, embedder)
+    assert store.search("doc1", top_k=1)[0]["content"] == "doc1"
+    
+    store.add_documents([make_chunk("doc3")])
+    assert not store._index_mapped
+    assert_aligned(store, embedder)
+
+
+def test_quantization_does_not_block_searches_and_keeps_concurrent_adds(make_store, monkeypatch):
+    settings = vector_store_module.get_settings()
+    monkeypatch.setattr(settings, "index_type", "ivfpq")
+    monkeypatch.setattr(settings, "ivfpq_nlist", 4)
+    monkeypatch.setattr(settings, "ivfpq_m", 8)
+    monkeypatch.setattr(vector_store_module, "IVFPQ_MIN_TRAIN_SIZE", 300)
+    
+    training = threading.Event()
+    release = threading.Event()
+    train = faiss.IndexIVFPQ.train
+    
+    def slow_train(index, vectors):
+        training.set()
+        assert release.wait(5)
+        return train(index, vectors)
+    
+    monkeypatch.setattr(faiss.IndexIVFPQ, "train", slow_train)
+    store = make_store()
+    store.add_documents([make_chunk(f"doc{i}") for i in range(299)])
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        quantizing = executor.submit(store.add_documents, [make_chunk("doc299")])
+        assert training.wait(5)
+        # The lock is free while training, so searches and adds go through
+        assert store.search("doc5", top_k=1)[0]["content"] == "doc5"
+        store.add_documents([make_chunk(f"late{i}") for i in range(5)])
+        release.set()
+        quantizing.result()
+    
+    assert isinstance(store.index, faiss.IndexIVFPQ)
+    assert store.index.ntotal == len(store.documents) == 305
+    assert store.search("late3", top_k=1)[0]["content"] == "late3"